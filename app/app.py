@@ -1,17 +1,258 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import streamlit as st
-from pathlib import Path
+
+try:
+    import ahocorasick
+except ImportError:  # optional; we fall back to the combined regex
+    ahocorasick = None
+
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_PATH = BASE_DIR / "data_processed" / "peptide_prices_master.csv"
+# prepare_data.py writes Parquet; the CSV path covers data produced before
+# the switch
+PARQUET_PATH = BASE_DIR / "data_processed" / "peptide_prices_master.parquet"
+CSV_PATH = BASE_DIR / "data_processed" / "peptide_prices_master.csv"
+
+# One alternation for the canonical-name cleanup: drop dose tokens (group 1),
+# turn every other separator run into a space. Keeps digits in names
+# (ARA-290, SNAP-8, BPC 157, etc.).
+_CANON_RE = re.compile(r"(\b\d+(?:\.\d+)?\s*(?:MG|MCG|UG|IU)\b)|[-_]|[^\w]+")
+
+
+def _canon_name(s):
+    """Clean one upper-cased product name in a single regex pass."""
+    # split/join collapses the runs of spaces the substitutions leave behind
+    return " ".join(_CANON_RE.sub(lambda m: "" if m.lastindex else " ", s).split())
+
+
+# elementwise formatters for the display-cell arrays
+_FMT_PRICE = np.frompyfunc("${:,.2f}".format, 1, 1)
+_FMT_PPM = np.frompyfunc(" / ${:.2f} per mg".format, 1, 1)
+
+# =======================
+# Alias Normalization Rules
+# =======================
+# Each rule is (pattern, canonical name). Rules are listed in priority order:
+# when several rules match the same row, the LAST one listed wins (same
+# semantics as the old sequential df.loc[...] rewrites). Every pattern is
+# anchored at the start of the string; "contains" rules use a lazy ^.*?
+# prefix and multi-condition rules use lookaheads.
+_ALIAS_RULES = [
+    # RETA/TIRZE/SEMA → full names
+    (r"RETA", "RETATRUTIDE"),
+    (r"TIRZE", "TIRZEPATIDE"),
+    (r"SEMA", "SEMAGLUTIDE"),
+    # SS-31
+    (r"SS 31$", "SS-31"),
+    # ARA-290 / SNAP-8 / BPC 157 prettification
+    (r"ARA 290", "ARA-290"),
+    (r"SNAP 8", "SNAP-8"),
+    (r"BPC 157", "BPC 157"),
+    # BAC / BACTERIOSTATIC WATER
+    (r".*?BAC WATER", "BACTERIOSTATIC WATER"),
+    (r".*?BACTERIOSTATIC", "BACTERIOSTATIC WATER"),
+    # BPC TB → BPC TB BLEND (incl. TB10MG BPC 157 and similar blends)
+    (r"BPC TB", "BPC TB BLEND"),
+    (r"(?=.*BPC).*?TB", "BPC TB BLEND"),
+    # CAGR → CAGRILINTIDE
+    (r"CAGR", "CAGRILINTIDE"),
+    # EPITALON / EPITHALON
+    (r".*?EPITHALON", "EPITHALON"),
+    (r".*?EPITALON", "EPITHALON"),
+    # GLUTATHIONE variants
+    (r"GLUTATHIONE", "GLUTATHIONE"),
+    # MAZDUTIDE / misspellings
+    (r".*?MAZDU", "MAZDUTIDE"),
+    # MOTS C / MOTSC
+    (r"MOTS ?C$", "MOTS C"),
+    # CJC NO DAC variations
+    (r"(?=.*NO DAC).*?CJC", "CJC NO DAC"),
+    (r"(?=.*WITHOUT DAC).*?CJC", "CJC NO DAC"),
+    (r"(?=.*WHITOUT DAC).*?CJC", "CJC NO DAC"),
+    # CJC IPA variations
+    (r"(?=.*IPA).*?CJC", "CJC NO DAC IPA"),
+    # MELANOTAN I variants
+    (r".*?MELANOTAN 1", "MELANOTAN I"),
+    (r".*?MELANOTAN I", "MELANOTAN I"),
+    (r"MELANOTAN$", "MELANOTAN I"),
+    (r"MT 1$", "MELANOTAN I"),
+    # KLOW blends
+    (r"KLOW", "KLOW"),
+    (r".*?KLOW TB BP KP GHK", "KLOW"),
+    (r".*?BPC GHK CU TB KPV", "KLOW"),
+    # GLOW and blends
+    (r"GLOW", "GLOW"),
+    (r".*?GLOW TB BP GHK", "GLOW"),
+    (r".*?GLOW TBMG", "GLOW"),
+    (r"(?!.*KPV).*?BPC GHK CU TB", "GLOW"),
+    # HCG / HUMAN CHORIONIC GONADOTROPIN
+    (r"HCG$", "HUMAN CHORIONIC GONADOTROPIN"),
+    (r".*?CHORIONIC", "HUMAN CHORIONIC GONADOTROPIN"),
+    # PEG-MGF variations → PEG MGF
+    (r".*?PEG ?MGF", "PEG MGF"),
+    # AOD / AOD-9604
+    (r"AOD", "AOD-9604"),
+    # FOXO4 / FOXO4-DRI
+    (r"FOXO4", "FOXO4-DRI"),
+    # IGF-1 LR3 variations
+    (r".*?IGF", "IGF-1 LR3"),
+    # KISSPEPTIN / KISSPEPTIN-10
+    (r"KISSPEPTIN", "KISSPEPTIN-10"),
+    # L-CARNITINE variations
+    (r"L CARNITINE", "L-CARNITINE"),
+    # LL-37 variations
+    (r"LL ?37$", "LL-37"),
+    # PT-141 variations
+    (r"PT ?141$", "PT-141"),
+]
+
+# canonical names indexed by global rule number
+_ALIAS_TARGETS = np.array(
+    [canonical for _pat, canonical in _ALIAS_RULES], dtype=object
+)
+
+# plain-substring rules (".*?LITERAL" with no other regex syntax) can go into
+# an Aho-Corasick automaton and be matched for all rules in one linear scan
+_LITERAL_CONTAINS_RE = re.compile(r"^\.\*\?[\w ]+$")
+
+
+def _build_alias_matchers():
+    """Split the rules into an Aho-Corasick automaton (literal substring
+    rules, when pyahocorasick is available) and one compiled alternation
+    (everything else). Regex branches are in REVERSE rule order so the first
+    branch that matches is the highest-priority rule; anchoring every branch
+    at ^ makes branch order (not match position) decide the winner."""
+    automaton = None
+    regex_rules = list(enumerate(_ALIAS_RULES))
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        regex_rules = []
+        for idx, (pat, _canonical) in enumerate(_ALIAS_RULES):
+            if _LITERAL_CONTAINS_RE.match(pat):
+                # rule number doubles as priority (later rules win)
+                automaton.add_word(pat[3:], idx)
+            else:
+                regex_rules.append((idx, _ALIAS_RULES[idx]))
+        automaton.make_automaton()
 
+    alias_re = re.compile(
+        "|".join(f"(?P<a{i}>^{pat})" for i, (pat, _c) in reversed(regex_rules))
+    )
+    # regex group position -> global rule number (reversed, like the branches)
+    group_rule_idx = np.array([i for i, _rule in reversed(regex_rules)])
+    return automaton, alias_re, group_rule_idx
+
+
+_ALIAS_AUTOMATON, _ALIAS_RE, _ALIAS_GROUP_IDX = _build_alias_matchers()
+
+# Plain startswith rules whose outcome is decided by the first word alone.
+# Rows resolved here never reach the automaton/regex matcher; the remaining
+# rules (anchored $, multi-word prefixes, substring blends) fall through.
+_PREFIX_ALIASES = [
+    ("RETA", "RETATRUTIDE"),
+    ("TIRZE", "TIRZEPATIDE"),
+    ("SEMA", "SEMAGLUTIDE"),
+    ("CAGR", "CAGRILINTIDE"),
+    ("GLUTATHIONE", "GLUTATHIONE"),
+    ("KLOW", "KLOW"),
+    ("GLOW", "GLOW"),
+    ("AOD", "AOD-9604"),
+    ("FOXO4", "FOXO4-DRI"),
+    ("KISSPEPTIN", "KISSPEPTIN-10"),
+]
+
+
+@lru_cache(maxsize=None)
+def _prefix_target(token):
+    for prefix, canonical in _PREFIX_ALIASES:
+        if token.startswith(prefix):
+            return canonical
+    return None
+
+
+def _apply_aliases(cp):
+    """Map a canonical_peptide Series through the alias rules."""
+    # first-token fast path: one cached lookup per row instead of the matcher
+    out = cp.str.split(" ", n=1).str[0].map(_prefix_target)
+    todo = out.isna()
+    if todo.any():
+        out[todo] = _match_aliases(cp[todo])
+    return out
+
+
+def _match_aliases(cp):
+    """Run the full automaton + combined-regex rule set in one pass."""
+    hits = cp.str.extract(_ALIAS_RE).notna().to_numpy()
+    matched = hits.any(axis=1)
+    best = np.where(matched, _ALIAS_GROUP_IDX.take(hits.argmax(axis=1)), -1)
+
+    if _ALIAS_AUTOMATON is not None:
+        for row, s in enumerate(cp.tolist()):
+            for _end, rule_idx in _ALIAS_AUTOMATON.iter(s):
+                if rule_idx > best[row]:
+                    best[row] = rule_idx
+
+    return pd.Series(
+        np.where(best >= 0, _ALIAS_TARGETS.take(best), cp.to_numpy()),
+        index=cp.index,
+    )
+
+
+def _normalize(df):
+    """Build canonical_peptide, apply the alias rules and fix total_mg_per_kit."""
+    # ---------- build canonical peptide name ----------
+    # far fewer distinct product names than rows: run the cleanup + alias
+    # rules once per unique name and map the results back
+    uniq = pd.Series(df["product_name"].unique())
+    canon = _apply_aliases(
+        uniq.str.upper().map(_canon_name, na_action="ignore").fillna("")
+    )
+    df["canonical_peptide"] = df["product_name"].map(
+        dict(zip(uniq, canon))
+    ).fillna("")
+
+    # ---------- normalize total mg per kit ----------
+    # Business rule: kit is always 10 vials, so total_mg_per_kit = 10 * dose_mg_per_vial
+    mask = df["dose_mg_per_vial"].notna()
+    df.loc[mask, "total_mg_per_kit"] = df.loc[mask, "dose_mg_per_vial"] * 10
+
+    # ---------- shrink dtypes ----------
+    # vendor/canonical_peptide are low-cardinality and heavily used in
+    # groupby/isin/pivot; categorical codes make those integer operations.
+    # dose/total stay float64: 0.1, 150.3 etc. are not float32-exact and
+    # would render as 0.10000000149... once widened for display
+    df["vendor"] = df["vendor"].astype("category")
+    df["canonical_peptide"] = df["canonical_peptide"].astype("category")
+    df["dose_mg_per_vial"] = df["dose_mg_per_vial"].astype("float64")
+    df["total_mg_per_kit"] = df["total_mg_per_kit"].astype("float64")
+    df["vials_per_kit"] = df["vials_per_kit"].astype("Int16")
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv(DATA_PATH)
     return df
 
 
+@st.cache_data
+def get_normalized_df():
+    # Arrow-backed strings keep memory down and dispatch the .str kernels
+    # in _normalize to Arrow instead of per-cell Python
+    if PARQUET_PATH.exists():
+        df = pd.read_parquet(PARQUET_PATH, dtype_backend="pyarrow")
+    else:
+        df = pd.read_csv(CSV_PATH, engine="pyarrow", dtype_backend="pyarrow")
+    return _normalize(df)
+
+
+@st.cache_data(hash_funcs={UploadedFile: lambda f: f.file_id})
+def read_uploaded_csv(f):
+    return pd.read_csv(f, engine="pyarrow", dtype_backend="pyarrow")
+
+
 def main():
     st.set_page_config(page_title="Peptide Price Comparator", layout="wide")
     st.title("Peptide Price Comparator")
@@ -45,8 +286,8 @@ def main():
         st.markdown("**Example CSV format:**")
         st.code(example_text, language="csv")
 
-    # ---------- load base data ----------
-    df = load_data()
+    # ---------- load base data (read + normalized once, then cached) ----------
+    df = get_normalized_df()
 
     if df.empty:
         st.warning("No data found. Run prepare_data.py first.")
@@ -76,9 +317,11 @@ def main():
 
         base_cols = list(df.columns)
 
+        # collect valid uploads and concat once, instead of growing df per file
+        pieces = [df]
         for f in uploaded_files:
             try:
-                extra = pd.read_csv(f)
+                extra = read_uploaded_csv(f)
 
                 missing = set(required_cols) - set(extra.columns)
                 if missing:
@@ -92,132 +335,16 @@ def main():
                     if col not in extra.columns:
                         extra[col] = pd.NA
 
-                # reorder columns to match base df
-                extra = extra[base_cols]
+                # reorder columns to match base df, then normalize like the base data
+                extra = _normalize(extra[base_cols])
 
-                # append
-                df = pd.concat([df, extra], ignore_index=True)
+                pieces.append(extra)
                 st.sidebar.success(f"Added {len(extra)} rows from {f.name}")
             except Exception as e:
                 st.sidebar.error(f"Error reading {f.name}: {e}")
 
-    # ---------- build canonical peptide name ----------
-    df["canonical_peptide"] = (
-        df["product_name"]
-        .str.upper()
-        .str.replace(r"\b\d+(\.\d+)?\s*(MG|MCG|UG|IU)\b", "", regex=True)
-        # keep digits in names (ARA-290, SNAP-8, BPC 157, etc.)
-        .str.replace(r"[-_]", " ", regex=True)
-        .str.replace(r"[^\w]+", " ", regex=True)
-        .str.replace(r"\s+", " ", regex=True)
-        .str.strip()
-    )
-
-    # Base alias normalization: RETA/TIRZE/SEMA → full names
-    cp = df["canonical_peptide"].fillna("")
-    df.loc[cp.str.startswith("RETA"), "canonical_peptide"] = "RETATRUTIDE"
-    df.loc[cp.str.startswith("TIRZE"), "canonical_peptide"] = "TIRZEPATIDE"
-    df.loc[cp.str.startswith("SEMA"), "canonical_peptide"] = "SEMAGLUTIDE"
-
-    # =======================
-    # Alias Normalization Block
-    # =======================
-    cp = df["canonical_peptide"].str.upper().fillna("")
-
-    # --- SS-31 ---
-    df.loc[cp.str.match(r"^SS 31$"), "canonical_peptide"] = "SS-31"
-
-    # --- ARA-290 / SNAP-8 / BPC 157 prettification ---
-    df.loc[cp.str.startswith("ARA 290"), "canonical_peptide"] = "ARA-290"
-    df.loc[cp.str.startswith("SNAP 8"), "canonical_peptide"] = "SNAP-8"
-    df.loc[cp.str.startswith("BPC 157"), "canonical_peptide"] = "BPC 157"
-
-    # --- BAC / BACTERIOSTATIC WATER ---
-    df.loc[cp.str.contains("BAC WATER"), "canonical_peptide"] = "BACTERIOSTATIC WATER"
-    df.loc[cp.str.contains("BACTERIOSTATIC"), "canonical_peptide"] = "BACTERIOSTATIC WATER"
-
-    # --- BPC TB → BPC TB BLEND ---
-    df.loc[cp.str.startswith("BPC TB"), "canonical_peptide"] = "BPC TB BLEND"
-    # TB10MG BPC 157 and similar blends
-    df.loc[(cp.str.contains("TB")) & (cp.str.contains("BPC")), "canonical_peptide"] = "BPC TB BLEND"
-
-    # --- CAGR → CAGRILINTIDE ---
-    df.loc[cp.str.startswith("CAGR"), "canonical_peptide"] = "CAGRILINTIDE"
-
-    # --- EPITALON / EPITHALON ---
-    df.loc[cp.str.contains("EPITHALON"), "canonical_peptide"] = "EPITHALON"
-    df.loc[cp.str.contains("EPITALON"), "canonical_peptide"] = "EPITHALON"
-
-    # --- GLUTATHIONE variants ---
-    df.loc[cp.str.startswith("GLUTATHIONE"), "canonical_peptide"] = "GLUTATHIONE"
-
-    # --- MAZDUTIDE / misspellings ---
-    df.loc[cp.str.contains("MAZDU"), "canonical_peptide"] = "MAZDUTIDE"
-
-    # --- MOTS C / MOTSC ---
-    df.loc[cp.str.replace(" ", "", regex=False) == "MOTSC", "canonical_peptide"] = "MOTS C"
-
-    # --- CJC NO DAC variations ---
-    df.loc[cp.str.contains("CJC") & cp.str.contains("NO DAC"), "canonical_peptide"] = "CJC NO DAC"
-    df.loc[cp.str.contains("CJC") & cp.str.contains("WITHOUT DAC"), "canonical_peptide"] = "CJC NO DAC"
-    df.loc[cp.str.contains("CJC") & cp.str.contains("WHITOUT DAC"), "canonical_peptide"] = "CJC NO DAC"
-
-    # --- CJC IPA variations ---
-    df.loc[cp.str.contains("CJC") & cp.str.contains("IPA"), "canonical_peptide"] = "CJC NO DAC IPA"
-
-    # --- MELANOTAN I variants ---
-    df.loc[cp.str.contains("MELANOTAN 1"), "canonical_peptide"] = "MELANOTAN I"
-    df.loc[cp.str.contains("MELANOTAN I"), "canonical_peptide"] = "MELANOTAN I"
-    df.loc[cp.str.match(r"^MELANOTAN$"), "canonical_peptide"] = "MELANOTAN I"
-    df.loc[cp.str.match(r"^MT 1$"), "canonical_peptide"] = "MELANOTAN I"
-
-    # --- KLOW blends ---
-    df.loc[cp.str.startswith("KLOW"), "canonical_peptide"] = "KLOW"
-    df.loc[cp.str.contains("KLOW TB BP KP GHK"), "canonical_peptide"] = "KLOW"
-    df.loc[cp.str.contains("BPC GHK CU TB KPV"), "canonical_peptide"] = "KLOW"
-
-    # --- GLOW and blends ---
-    df.loc[cp.str.startswith("GLOW"), "canonical_peptide"] = "GLOW"
-    df.loc[cp.str.contains("GLOW TB BP GHK"), "canonical_peptide"] = "GLOW"
-    df.loc[cp.str.contains("GLOW TBMG"), "canonical_peptide"] = "GLOW"
-    glow_bpc_mask = cp.str.contains("BPC GHK CU TB") & ~cp.str.contains("KPV")
-    df.loc[glow_bpc_mask, "canonical_peptide"] = "GLOW"
-
-    # --- HCG / HUMAN CHORIONIC GONADOTROPIN ---
-    df.loc[cp == "HCG", "canonical_peptide"] = "HUMAN CHORIONIC GONADOTROPIN"
-    df.loc[cp.str.contains("CHORIONIC"), "canonical_peptide"] = "HUMAN CHORIONIC GONADOTROPIN"
-
-    # --- PEG-MGF variations → PEG MGF ---
-    df.loc[
-        cp.str.replace(" ", "", regex=False).str.contains("PEGMGF"),
-        "canonical_peptide",
-    ] = "PEG MGF"
-
-    # --- AOD / AOD-9604 ---
-    df.loc[cp.str.startswith("AOD"), "canonical_peptide"] = "AOD-9604"
-
-    # --- FOXO4 / FOXO4-DRI ---
-    df.loc[cp.str.startswith("FOXO4"), "canonical_peptide"] = "FOXO4-DRI"
-
-    # --- IGF-1 LR3 variations ---
-    df.loc[cp.str.contains("IGF"), "canonical_peptide"] = "IGF-1 LR3"
-
-    # --- KISSPEPTIN / KISSPEPTIN-10 ---
-    df.loc[cp.str.startswith("KISSPEPTIN"), "canonical_peptide"] = "KISSPEPTIN-10"
-
-    # --- L-CARNITINE variations ---
-    df.loc[cp.str.startswith("L CARNITINE"), "canonical_peptide"] = "L-CARNITINE"
-
-    # --- LL-37 variations ---
-    df.loc[cp.str.match(r"^LL ?37$"), "canonical_peptide"] = "LL-37"
-
-    # --- PT-141 variations ---
-    df.loc[cp.str.match(r"^PT ?141$"), "canonical_peptide"] = "PT-141"
-
-    # ---------- normalize total mg per kit ----------
-    # Business rule: kit is always 10 vials, so total_mg_per_kit = 10 * dose_mg_per_vial
-    mask = df["dose_mg_per_vial"].notna()
-    df.loc[mask, "total_mg_per_kit"] = df.loc[mask, "dose_mg_per_vial"] * 10
+        if len(pieces) > 1:
+            df = pd.concat(pieces, ignore_index=True)
 
     # ---------- sidebar filters ----------
     st.sidebar.header("Filters")
@@ -247,13 +374,16 @@ def main():
     only_with_ppm = st.sidebar.checkbox("Only show rows with price-per-mg", value=False)
 
     # ---------- apply filters ----------
-    filt = df.copy()
+    # AND the active filters into one mask and slice once, instead of
+    # copying the frame per filter
+    mask = np.ones(len(df), dtype=bool)
     if selected_peptides:
-        filt = filt[filt["canonical_peptide"].isin(selected_peptides)]
+        mask &= df["canonical_peptide"].isin(selected_peptides).to_numpy()
     if selected_vendors:
-        filt = filt[filt["vendor"].isin(selected_vendors)]
+        mask &= df["vendor"].isin(selected_vendors).to_numpy()
     if only_with_ppm:
-        filt = filt[filt["price_per_mg"].notna()]
+        mask &= df["price_per_mg"].notna().to_numpy()
+    filt = df.loc[mask]
 
     if filt.empty:
         st.warning("No rows match the current filters.")
@@ -269,16 +399,24 @@ def main():
     grouped = (
         filt[group_cols + ["price_usd", "price_per_mg"]]
         .dropna(subset=["dose_mg_per_vial"])
-        .groupby(group_cols, as_index=False)
+        .groupby(group_cols, as_index=False, observed=True)
         .agg(agg_cols)
     )
 
     # ---------- pivot with numeric values ----------
-    pivot = grouped.pivot_table(
-        index=["canonical_peptide", "dose_mg_per_vial", "total_mg_per_kit"],
-        columns="vendor",
-        values=["price_usd", "price_per_mg"],
-        aggfunc="min",
+    # groupby().min().unstack() is cheaper than pivot_table and works on the
+    # categorical codes; unused vendor categories are dropped first so
+    # unstack does not materialize all-NaN columns for filtered-out vendors
+    # (astype: concat with uploads can degrade vendor back to object)
+    grouped["vendor"] = grouped["vendor"].astype("category").cat.remove_unused_categories()
+    pivot = (
+        grouped.groupby(
+            ["canonical_peptide", "dose_mg_per_vial", "total_mg_per_kit", "vendor"],
+            sort=True,
+            observed=True,
+        )[["price_usd", "price_per_mg"]]
+        .min()
+        .unstack("vendor")
     )
 
     pivot = pivot.sort_index().reset_index()
@@ -306,10 +444,26 @@ def main():
     ppm_cols = list(ppm_col_map.values())
 
     if ppm_cols:
-        ppm_numeric = pivot[ppm_cols]
-        ranks = ppm_numeric.rank(axis=1, method="min", ascending=True)
-        best_mask = ranks.eq(1)
-        second_mask = ranks.eq(2)
+        # only the two smallest values per row matter, so a partial
+        # np.partition beats ranking the whole row. Matching rank(method=
+        # "min"): ties at the minimum are all best and suppress any second.
+        arr = pivot[ppm_cols].to_numpy(dtype="float64", na_value=np.nan)
+        arr_inf = np.where(np.isnan(arr), np.inf, arr)
+        if arr_inf.shape[1] > 1:
+            two = np.partition(arr_inf, 1, axis=1)
+            v1 = two[:, :1]
+            v2 = two[:, 1:2]
+        else:
+            v1 = arr_inf
+            v2 = np.full_like(v1, np.inf)
+        best_mask = pd.DataFrame(
+            np.isfinite(v1) & (arr_inf == v1), index=pivot.index, columns=ppm_cols
+        )
+        second_mask = pd.DataFrame(
+            np.isfinite(v2) & (v2 > v1) & (arr_inf == v2),
+            index=pivot.index,
+            columns=ppm_cols,
+        )
     else:
         best_mask = pd.DataFrame(False, index=pivot.index, columns=vendor_names)
         second_mask = pd.DataFrame(False, index=pivot.index, columns=vendor_names)
@@ -317,45 +471,30 @@ def main():
     # ---------- build display table with vendor strings ----------
     display = pivot[["canonical_peptide", "dose_mg_per_vial", "total_mg_per_kit"]].copy()
 
-    for vendor in vendor_names:
-        col_price = f"{vendor}_price_usd"
-        col_ppm = f"{vendor}_price_per_mg"
-
-        if col_price not in pivot.columns:
-            continue
-
-        prices = pivot[col_price]
-        ppms = pivot[col_ppm] if col_ppm in pivot.columns else pd.Series([None] * len(pivot))
-
-        vendor_best = best_mask[ppm_col_map[vendor]] if vendor in ppm_col_map else pd.Series(
-            False, index=pivot.index
-        )
-        vendor_second = second_mask[ppm_col_map[vendor]] if vendor in ppm_col_map else pd.Series(
-            False, index=pivot.index
-        )
-
-        cells = []
-        for price, ppm, is_best, is_second in zip(prices, ppms, vendor_best, vendor_second):
-            if pd.isna(price):
-                cells.append("")
-                continue
-
-            marker = ""
-            if is_best:
-                marker = "🟩 "
-            elif is_second:
-                marker = "🟨 "
-
-            price_str = f"${price:,.2f}"
-            if pd.notna(ppm):
-                ppm_str = f"${ppm:.2f} per mg"
-                cell = f"{marker}{price_str} / {ppm_str}"
-            else:
-                cell = f"{marker}{price_str}"
-
-            cells.append(cell)
-
-        display[vendor] = cells
+    # hoist the per-vendor columns into 2-D arrays once; the cell build below
+    # is then a single columnar pass instead of per-vendor Series lookups
+    price_vendors = [v for v in vendor_names if f"{v}_price_usd" in pivot.columns]
+    prices_np = pivot[[f"{v}_price_usd" for v in price_vendors]].to_numpy(
+        dtype="float64", na_value=np.nan
+    )
+    ppms_np = np.full(prices_np.shape, np.nan)
+    best_np = np.zeros(prices_np.shape, dtype=bool)
+    second_np = np.zeros(prices_np.shape, dtype=bool)
+    for j, vendor in enumerate(price_vendors):
+        if vendor in ppm_col_map:
+            col_ppm = ppm_col_map[vendor]
+            ppms_np[:, j] = pivot[col_ppm].to_numpy(dtype="float64", na_value=np.nan)
+            best_np[:, j] = best_mask[col_ppm].to_numpy()
+            second_np[:, j] = second_mask[col_ppm].to_numpy()
+
+    has_price = ~np.isnan(prices_np)
+    marker = np.where(best_np, "🟩 ", np.where(second_np, "🟨 ", "")).astype(object)
+    price_str = np.where(has_price, _FMT_PRICE(prices_np), "")
+    ppm_str = np.where(~np.isnan(ppms_np), _FMT_PPM(ppms_np), "")
+    cells = np.where(has_price, marker + price_str + ppm_str, "")
+
+    for j, vendor in enumerate(price_vendors):
+        display[vendor] = cells[:, j]
 
     # Rename for display
     display = display.rename(
@@ -368,9 +507,12 @@ def main():
 
     # ---------- persistent selection using session_state ----------
     # Create a stable row key: Peptide|Dose|TotalMg
-    display["row_key"] = display.apply(
-        lambda r: f"{r['Peptide']}|{r['Dose (mg/vial)']}|{r['Total mg/kit']}",
-        axis=1,
+    display["row_key"] = (
+        display["Peptide"].astype(str)
+        + "|"
+        + display["Dose (mg/vial)"].astype(str)
+        + "|"
+        + display["Total mg/kit"].astype(str)
     )
 
     # Initialize stored selection if needed
@@ -413,19 +555,7 @@ def main():
     new_keys_set = prev_outside_view | checked_keys
     st.session_state["selected_row_keys"] = list(new_keys_set)
 
-    # Decode selected_keys as (Peptide, Dose, Total mg) for Phase 2
-    selected_keys = []
-    for key in st.session_state["selected_row_keys"]:
-        pep, dose_str, total_str = key.split("|")
-        try:
-            dose_val = float(dose_str)
-        except ValueError:
-            dose_val = None
-        try:
-            total_val = float(total_str)
-        except ValueError:
-            total_val = None
-        selected_keys.append((pep, dose_val, total_val))
+    selected_keys = st.session_state["selected_row_keys"]
 
     # ---------- Phase 2: pivoted price list by vendor for selected rows ----------
     st.subheader("Price list by vendor for selected peptides")
@@ -433,23 +563,38 @@ def main():
     if not selected_keys:
         st.info("Select one or more rows above to see the price list.")
     else:
-        sel_df = pd.DataFrame(
-            selected_keys,
-            columns=["Peptide", "Dose (mg/vial)", "Total mg/kit"],
+        # decode "Peptide|Dose|Total" keys in one vectorized split; str()/float()
+        # round-trip exactly for float64, so the keys match the columns
+        sel_df = pd.Series(selected_keys).str.split("|", expand=True)
+        sel_df.columns = ["Peptide", "Dose (mg/vial)", "Total mg/kit"]
+        sel_df[["Dose (mg/vial)", "Total mg/kit"]] = sel_df[
+            ["Dose (mg/vial)", "Total mg/kit"]
+        ].apply(pd.to_numeric, errors="coerce")
+
+        # single indexed probe of the grouped frame instead of hashing a
+        # 3-column merge; unmatched keys simply select nothing, like the
+        # old left-merge rows that pivoted away as all-NaN
+        grouped_idx = grouped.set_index(
+            ["canonical_peptide", "dose_mg_per_vial", "total_mg_per_kit"]
         )
-
-        merged = sel_df.merge(
-            grouped,
-            left_on=["Peptide", "Dose (mg/vial)", "Total mg/kit"],
-            right_on=["canonical_peptide", "dose_mg_per_vial", "total_mg_per_kit"],
-            how="left",
+        sel_index = pd.MultiIndex.from_frame(sel_df)
+        merged = grouped_idx[grouped_idx.index.isin(sel_index)].reset_index()
+        merged = merged.rename(
+            columns={
+                "canonical_peptide": "Peptide",
+                "dose_mg_per_vial": "Dose (mg/vial)",
+                "total_mg_per_kit": "Total mg/kit",
+            }
         )
+        # the TOTAL row writes a string into this column later
+        merged["Peptide"] = merged["Peptide"].astype(object)
 
         price_pivot = merged.pivot_table(
             index=["Peptide", "Dose (mg/vial)"],
             columns="vendor",
             values="price_usd",
             aggfunc="min",
+            observed=True,
         )
 
         # drop vendors with no prices at all
@@ -486,14 +631,16 @@ def main():
             # start from numeric prices
             display_prices = price_pivot.reset_index()
 
-            # add TOTAL row (numeric)
+            # the loops below write "" and formatted strings into these
+            # columns, so detach them from their numeric dtype first
+            display_prices["Dose (mg/vial)"] = display_prices["Dose (mg/vial)"].astype(object)
+            display_prices[ordered_vendors] = display_prices[ordered_vendors].astype(object)
+
+            # add TOTAL row (numeric) in place instead of concat-copying the frame
             total_row = {"Peptide": "TOTAL", "Dose (mg/vial)": ""}
             for v in ordered_vendors:
                 total_row[v] = vendor_totals[v]
-            display_prices = pd.concat(
-                [display_prices, pd.DataFrame([total_row])],
-                ignore_index=True,
-            )
+            display_prices.loc[len(display_prices)] = total_row
 
             # ---------- per-row top-3 ranking with color coding (by unique price levels) ----------
             def color_ranked_price(val, level):
@@ -581,7 +728,8 @@ def main():
                 .dropna(subset=["dose_mg_per_vial"])
                 .groupby(
                     ["canonical_peptide", "dose_mg_per_vial", "total_mg_per_kit"],
-                    as_index=False
+                    as_index=False,
+                    observed=True,
                 )
                 .agg({"price_usd": "min", "price_per_mg": "min"})
             )
@@ -1,4 +1,5 @@
-import re
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
@@ -8,9 +9,32 @@ import pdfplumber
 BASE_DIR = Path(__file__).resolve().parent
 RAW = BASE_DIR / "data_raw"            # where your PDFs live
 OUT_DIR = BASE_DIR / "data_processed"  # where we'll write the CSV
+CACHE_DIR = RAW / ".cache"             # pickled extract_tables() output
 OUT_DIR.mkdir(exist_ok=True)
 
 
+def cached_tables(path):
+    """
+    Per-page extract_tables() output for a PDF, cached on disk keyed by file
+    size + mtime. pdfplumber table extraction dominates the run time, so
+    unchanged PDFs skip it entirely on re-runs.
+    """
+    stat = path.stat()
+    cache_path = CACHE_DIR / f"{path.stem}-{stat.st_size}-{int(stat.st_mtime)}.pkl"
+
+    if cache_path.exists():
+        with open(cache_path, "rb") as fh:
+            return pickle.load(fh)
+
+    with pdfplumber.open(path) as pdf:
+        pages = [page.extract_tables() or [] for page in pdf.pages]
+
+    CACHE_DIR.mkdir(exist_ok=True)
+    with open(cache_path, "wb") as fh:
+        pickle.dump(pages, fh)
+    return pages
+
+
 # ----- helpers -----
 
 def to_float_price(x):
@@ -26,54 +50,59 @@ def to_float_price(x):
         return None
 
 
-def extract_mg(text):
-    """
-    Try to pull '10mg' etc out of spec/product string.
-    """
-    if not text:
-        return None
-    s = str(text).lower().replace(" ", "")
-    m = re.search(r"(\d+(?:\.\d+)?)(mg)", s)
-    if not m:
-        return None
-    return float(m.group(1))
+RAW_COLUMNS = ["vendor", "product_name", "spec_raw", "price_raw", "source_file"]
 
 
-def extract_vials(text):
+def standardize_rows(raw_rows):
     """
-    Try to pull '10 vials' from strings like '10mg/vial x 10vials'.
-    Default later is 10 if we can't see it.
+    Turn (vendor, product_name, spec, price_str, source_file) tuples into the
+    standardized frame. The mg/vials/price extraction runs as vectorized
+    column operations instead of per-row regex calls.
     """
-    if not text:
-        return None
-    s = str(text).lower().replace(" ", "")
-    m = re.search(r"(\d+)vials", s)
-    if m:
-        return int(m.group(1))
-    m = re.search(r"x(\d+)vials", s)
-    if m:
-        return int(m.group(1))
-    return None
-
-
-def standardize_row(vendor, product_name, spec, price_str, source_file):
-    price = to_float_price(price_str)
-    dose_mg_per_vial = extract_mg(spec) or extract_mg(product_name)
-    vials_per_kit = extract_vials(spec) or 10  # most vendors use 10-vial kits
-    total_mg = dose_mg_per_vial * vials_per_kit if dose_mg_per_vial else None
-    ppm = price / total_mg if (price is not None and total_mg) else None
-
-    return {
-        "vendor": vendor,
-        "product_name": product_name.strip() if product_name else "",
-        "spec_raw": spec.strip() if spec else "",
-        "price_usd": price,
-        "dose_mg_per_vial": dose_mg_per_vial,
-        "vials_per_kit": vials_per_kit,
-        "total_mg_per_kit": total_mg,
-        "price_per_mg": ppm,
-        "source_file": source_file,
-    }
+    df = pd.DataFrame(raw_rows, columns=RAW_COLUMNS)
+
+    df["product_name"] = df["product_name"].fillna("").str.strip()
+    df["spec_raw"] = df["spec_raw"].fillna("").str.strip()
+
+    df["price_usd"] = pd.to_numeric(
+        df["price_raw"].str.replace(r"[$,]", "", regex=True).str.strip(),
+        errors="coerce",
+    )
+
+    # pull '10mg' etc out of spec, falling back to the product string;
+    # lowercase + space-stripping matches things like '10 Mg'
+    spec_compact = df["spec_raw"].str.lower().str.replace(" ", "", regex=False)
+    name_compact = df["product_name"].str.lower().str.replace(" ", "", regex=False)
+    df["dose_mg_per_vial"] = (
+        spec_compact.str.extract(r"(\d+(?:\.\d+)?)mg", expand=False)
+        .fillna(name_compact.str.extract(r"(\d+(?:\.\d+)?)mg", expand=False))
+        .astype(float)
+    )
+
+    # '10 vials' from strings like '10mg/vial x 10vials'; most vendors use 10-vial kits
+    df["vials_per_kit"] = (
+        spec_compact.str.extract(r"(\d+)vials", expand=False)
+        .astype(float)
+        .fillna(10)
+        .astype(int)
+    )
+
+    df["total_mg_per_kit"] = df["dose_mg_per_vial"] * df["vials_per_kit"]
+    df["price_per_mg"] = df["price_usd"] / df["total_mg_per_kit"]
+
+    return df[
+        [
+            "vendor",
+            "product_name",
+            "spec_raw",
+            "price_usd",
+            "dose_mg_per_vial",
+            "vials_per_kit",
+            "total_mg_per_kit",
+            "price_per_mg",
+            "source_file",
+        ]
+    ]
 
 
 # ----- vendor parsers -----
@@ -90,34 +119,28 @@ def parse_hyb():
     if not path.exists():
         return rows
 
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables() or []
-            for table in tables:
-                if not table:
+    for tables in cached_tables(path):
+        for table in tables:
+            if not table:
+                continue
+
+            # find header row where first cell == "Code"
+            header_idx = None
+            for idx, row in enumerate(table):
+                if row and str(row[0]).strip() == "Code":
+                    header_idx = idx
+                    break
+            if header_idx is None:
+                continue
+
+            for r in table[header_idx + 1:]:
+                if not r or not r[0]:
                     continue
-
-                # find header row where first cell == "Code"
-                header_idx = None
-                for idx, row in enumerate(table):
-                    if row and str(row[0]).strip() == "Code":
-                        header_idx = idx
-                        break
-                if header_idx is None:
-                    continue
-
-                for r in table[header_idx + 1:]:
-                    if not r or not r[0]:
-                        continue
-                    # expect: [code, name, spec, 1kit, 10kits, ...]
-                    name = r[1] if len(r) > 1 else ""
-                    spec = r[2] if len(r) > 2 else ""
-                    price_1kit = r[3] if len(r) > 3 else None
-                    rows.append(
-                        standardize_row(
-                            "HYB", str(name), str(spec), str(price_1kit), path.name
-                        )
-                    )
+                # expect: [code, name, spec, 1kit, 10kits, ...]
+                name = r[1] if len(r) > 1 else ""
+                spec = r[2] if len(r) > 2 else ""
+                price_1kit = r[3] if len(r) > 3 else None
+                rows.append(("HYB", str(name), str(spec), str(price_1kit), path.name))
     return rows
 
 
@@ -133,37 +156,31 @@ def parse_cn_full():
     if not path.exists():
         return rows
 
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables() or []
-            for table in tables:
-                if not table:
+    for tables in cached_tables(path):
+        for table in tables:
+            if not table:
+                continue
+
+            # detect header row on first page
+            first = table[0]
+            has_header = first and "Cat. No." in str(first[0])
+            start_idx = 1 if has_header else 0
+
+            current_name = None
+            for r in table[start_idx:]:
+                if not r or not r[0]:
+                    continue
+                # r[0] = code
+                if len(r) > 1 and r[1]:
+                    current_name = r[1]
+                name = current_name
+                spec = r[2] if len(r) > 2 else ""
+                price = r[3] if len(r) > 3 else None
+
+                if not name or not price:
                     continue
 
-                # detect header row on first page
-                first = table[0]
-                has_header = first and "Cat. No." in str(first[0])
-                start_idx = 1 if has_header else 0
-
-                current_name = None
-                for r in table[start_idx:]:
-                    if not r or not r[0]:
-                        continue
-                    # r[0] = code
-                    if len(r) > 1 and r[1]:
-                        current_name = r[1]
-                    name = current_name
-                    spec = r[2] if len(r) > 2 else ""
-                    price = r[3] if len(r) > 3 else None
-
-                    if not name or not price:
-                        continue
-
-                    rows.append(
-                        standardize_row(
-                            "HXTNT", str(name), str(spec), str(price), path.name
-                        )
-                    )
+                rows.append(("HXTNT", str(name), str(spec), str(price), path.name))
     return rows
 
 
@@ -178,35 +195,29 @@ def parse_violet_single():
     if not path.exists():
         return rows
 
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables() or []
-            for table in tables:
-                if not table:
+    for tables in cached_tables(path):
+        for table in tables:
+            if not table:
+                continue
+
+            first = table[0]
+            has_header = first and "Cat. No." in str(first[0])
+            start_idx = 1 if has_header else 0
+
+            current_name = None
+            for r in table[start_idx:]:
+                if not r or not r[0]:
                     continue
+                if len(r) > 1 and r[1]:
+                    current_name = r[1]
+                name = current_name
+                spec = r[2] if len(r) > 2 else ""
+                price = r[3] if len(r) > 3 else None
 
-                first = table[0]
-                has_header = first and "Cat. No." in str(first[0])
-                start_idx = 1 if has_header else 0
-
-                current_name = None
-                for r in table[start_idx:]:
-                    if not r or not r[0]:
-                        continue
-                    if len(r) > 1 and r[1]:
-                        current_name = r[1]
-                    name = current_name
-                    spec = r[2] if len(r) > 2 else ""
-                    price = r[3] if len(r) > 3 else None
-
-                    if not name or not price:
-                        continue
-
-                    rows.append(
-                        standardize_row(
-                            "Violet", str(name), str(spec), str(price), path.name
-                        )
-                    )
+                if not name or not price:
+                    continue
+
+                rows.append(("Violet", str(name), str(spec), str(price), path.name))
     return rows
 
 
@@ -222,39 +233,33 @@ def parse_zj():
     if not path.exists():
         return rows
 
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables() or []
-            for table in tables:
-                if not table:
+    for tables in cached_tables(path):
+        for table in tables:
+            if not table:
+                continue
+
+            header_idx = None
+            for idx, row in enumerate(table):
+                if row and "SKU" in str(row[0]):
+                    header_idx = idx
+                    break
+            start_idx = header_idx + 1 if header_idx is not None else 0
+
+            current_name = None
+            for r in table[start_idx:]:
+                if not r or not r[0]:
                     continue
 
-                header_idx = None
-                for idx, row in enumerate(table):
-                    if row and "SKU" in str(row[0]):
-                        header_idx = idx
-                        break
-                start_idx = header_idx + 1 if header_idx is not None else 0
-
-                current_name = None
-                for r in table[start_idx:]:
-                    if not r or not r[0]:
-                        continue
-
-                    if len(r) > 1 and r[1]:
-                        current_name = r[1]
-                    name = current_name
-                    spec = r[2] if len(r) > 2 else ""
-                    price = r[3] if len(r) > 3 else None
-
-                    if not name or not price:
-                        continue
-
-                    rows.append(
-                        standardize_row(
-                            "ZJ", str(name), str(spec), str(price), path.name
-                        )
-                    )
+                if len(r) > 1 and r[1]:
+                    current_name = r[1]
+                name = current_name
+                spec = r[2] if len(r) > 2 else ""
+                price = r[3] if len(r) > 3 else None
+
+                if not name or not price:
+                    continue
+
+                rows.append(("ZJ", str(name), str(spec), str(price), path.name))
     return rows
 
 
@@ -291,9 +296,7 @@ def parse_mix():
         name = parts[0]
         price = parts[-1]
 
-        rows.append(
-            standardize_row("Mix", name, name, price, path.name)
-        )
+        rows.append(("Mix", name, name, price, path.name))
 
     return rows
 
@@ -311,35 +314,29 @@ def parse_uther():
     if not path.exists():
         return rows
 
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables() or []
-            for table in tables:
-                if not table or not table[0]:
-                    continue
+    for tables in cached_tables(path):
+        for table in tables:
+            if not table or not table[0]:
+                continue
+
+            first_cell = str(table[0][0]).lower()
 
-                first_cell = str(table[0][0]).lower()
+            # skip contact/shipping/cosmetic sections
+            if any(
+                kw in first_cell
+                for kw in ["contact us", "about shipping", "weight", "cosmetic powder"]
+            ):
+                continue
 
-                # skip contact/shipping/cosmetic sections
-                if any(
-                    kw in first_cell
-                    for kw in ["contact us", "about shipping", "weight", "cosmetic powder"]
-                ):
+            for r in table:
+                if not r or not r[0]:
+                    continue
+                name = r[0]
+                price = r[1] if len(r) > 1 else None
+                if not price or not to_float_price(price):
                     continue
 
-                for r in table:
-                    if not r or not r[0]:
-                        continue
-                    name = r[0]
-                    price = r[1] if len(r) > 1 else None
-                    if not price or not to_float_price(price):
-                        continue
-
-                    rows.append(
-                        standardize_row(
-                            "Uther", str(name), str(name), str(price), path.name
-                        )
-                    )
+                rows.append(("Uther", str(name), str(name), str(price), path.name))
     return rows
 
 
@@ -365,28 +362,37 @@ def parse_jeep_csv():
         pkg = r.get("package_text", "")
         price = r.get("price_usd", "")
         spec = f"{dose} {pkg}"
-        rows.append(
-            standardize_row(
-                vendor, str(name), str(spec), str(price), path.name
-            )
-        )
+        rows.append((vendor, str(name), str(spec), str(price), path.name))
 
     return rows
 
 
 # ----- main -----
 
+PARSERS = [
+    parse_hyb,
+    parse_cn_full,
+    parse_violet_single,
+    parse_zj,
+    parse_mix,
+    parse_uther,
+    parse_jeep_csv,
+]
+
+
+def _run_parser(parser):
+    return parser()
+
+
 def main():
+    # each parser reads its own file, so they parallelize cleanly;
+    # executor.map keeps the vendor order of PARSERS
     all_rows = []
-    all_rows += parse_hyb()
-    all_rows += parse_cn_full()
-    all_rows += parse_violet_single()
-    all_rows += parse_zj()
-    all_rows += parse_mix()
-    all_rows += parse_uther()
-    all_rows += parse_jeep_csv()
+    with ProcessPoolExecutor() as executor:
+        for rows in executor.map(_run_parser, PARSERS):
+            all_rows += rows
 
-    df = pd.DataFrame(all_rows)
+    df = standardize_rows(all_rows)
 
     # simple normalized key for grouping/filtering
     df["peptide_key"] = (
@@ -397,8 +403,10 @@ def main():
         .str.strip()
     )
 
-    out_path = OUT_DIR / "peptide_prices_master.csv"
-    df.to_csv(out_path, index=False)
+    # Parquet keeps the dtypes and loads via memory-mapped Arrow in the app,
+    # instead of re-parsing and re-inferring a CSV on every cold start
+    out_path = OUT_DIR / "peptide_prices_master.parquet"
+    df.to_parquet(out_path, index=False)
     print(f"Saved {len(df)} rows to {out_path}")
 
 